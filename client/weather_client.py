@@ -4,10 +4,73 @@ MCP Weather Client - Demonstrates MCP protocol with HTTP/SSE transport
 """
 import asyncio
 import argparse
-import json
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 import httpx
-from httpx_sse import aconnect_sse
+import msgspec
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
+
+async def aiter_sse_data(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Yield the raw data field of each SSE event in a streaming response.
+
+    Lines are scanned by offset in a single buffer and only ``data:`` fields
+    are copied out. Values are yielded as bytes so the caller can hand them
+    straight to the JSON decoder.
+    """
+    buffer = bytearray()
+    data = bytearray()
+    has_data = False
+    
+    async for chunk in response.aiter_bytes():
+        buffer += chunk
+        start = 0
+        
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_start = start
+            start = end + 1
+            if end > line_start and buffer[end - 1] == 0x0D:  # \r
+                end -= 1
+            
+            if end == line_start:
+                # Blank line ends the event
+                if has_data:
+                    yield bytes(data)
+                    data.clear()
+                    has_data = False
+            elif buffer.startswith(b"data:", line_start, end):
+                value_start = line_start + 5
+                if value_start < end and buffer[value_start] == 0x20:  # space
+                    value_start += 1
+                if has_data:
+                    data += b"\n"
+                data += buffer[value_start:end]
+                has_data = True
+            # Other fields (event, id, retry) and comments are not used
+        
+        del buffer[:start]
+
+
+# JSON-RPC message schema
+class RPCRequest(msgspec.Struct):
+    jsonrpc: str
+    method: str
+    params: dict
+    id: int
+
+
+class RPCResponse(msgspec.Struct, omit_defaults=True):
+    jsonrpc: str
+    id: Optional[int | str]
+    result: Optional[dict] = None
+    error: Optional[dict] = None
+
+
+rpc_decoder = msgspec.json.Decoder(RPCResponse)
+rpc_encoder = msgspec.json.Encoder()
 
 
 class MCPWeatherClient:
@@ -19,81 +82,120 @@ class MCPWeatherClient:
         self.message_url = f"{server_url}/message"
         self.verbose = verbose
         self.message_id = 0
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        self.http_client: Optional[httpx.AsyncClient] = None
         self.sse_task = None
-        self.response_queue = asyncio.Queue()
+        self._sse_ready = asyncio.Event()
+        # In-flight requests awaiting their SSE response, keyed by message ID
+        self._pending: dict[int, asyncio.Future] = {}
         
     def _next_id(self) -> int:
         """Generate next message ID"""
         self.message_id += 1
         return self.message_id
     
-    def _log_request(self, message: dict):
-        """Log outgoing request if verbose"""
+    def _log_message(self, title: str, message: msgspec.Struct):
+        """Pretty-print a JSON-RPC message if verbose"""
         if self.verbose:
             print("\n" + "="*60)
-            print("📤 CLIENT → SERVER REQUEST:")
+            print(title)
             print("="*60)
-            print(json.dumps(message, indent=2))
+            print(msgspec.json.format(rpc_encoder.encode(message), indent=2).decode())
             print()
     
-    def _log_response(self, message: dict):
+    def _log_request(self, message: RPCRequest):
+        """Log outgoing request if verbose"""
+        self._log_message("📤 CLIENT → SERVER REQUEST:", message)
+    
+    def _log_response(self, message: RPCResponse):
         """Log incoming response if verbose"""
-        if self.verbose:
-            print("\n" + "="*60)
-            print("📥 SERVER → CLIENT RESPONSE:")
-            print("="*60)
-            print(json.dumps(message, indent=2))
-            print()
+        self._log_message("📥 SERVER → CLIENT RESPONSE:", message)
     
     async def _sse_listener(self):
         """Listen for SSE messages from server"""
         try:
-            async with aconnect_sse(
-                self.http_client,
+            async with self.http_client.stream(
                 "GET",
-                self.sse_url
-            ) as event_source:
-                async for sse in event_source.aiter_sse():
+                self.sse_url,
+                headers={"Accept": "text/event-stream", "Cache-Control": "no-store"}
+            ) as response:
+                response.raise_for_status()
+                self._sse_ready.set()
+                async for raw in aiter_sse_data(response):
                     try:
-                        data = json.loads(sse.data)
-                        await self.response_queue.put(data)
-                    except json.JSONDecodeError:
-                        pass
+                        data = rpc_decoder.decode(raw)
+                    except msgspec.DecodeError:
+                        continue
+                    future = self._pending.pop(data.id, None)
+                    if future and not future.done():
+                        future.set_result(data)
         except Exception as e:
             if self.verbose:
                 print(f"⚠️  SSE connection closed: {e}")
+        finally:
+            # Wake connect() if the stream never opened
+            self._sse_ready.set()
+            # No more responses can arrive; fail anything still waiting
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("SSE connection closed"))
+            self._pending.clear()
     
-    async def _send_request(self, method: str, params: Optional[dict] = None) -> dict:
+    async def _send_request(self, method: str, params: Optional[dict] = None) -> RPCResponse:
         """Send JSON-RPC request and wait for response"""
         msg_id = self._next_id()
-        message = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params or {},
-            "id": msg_id
-        }
+        message = RPCRequest(
+            jsonrpc="2.0",
+            method=method,
+            params=params or {},
+            id=msg_id
+        )
         
         self._log_request(message)
         
-        # Send request
-        await self.http_client.post(self.message_url, json=message)
+        # Register before sending so a fast response is not missed
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
+        
+        try:
+            # Send request
+            await self.http_client.post(
+                self.message_url,
+                content=rpc_encoder.encode(message),
+                headers={"Content-Type": "application/json"}
+            )
+            
+            # Wait for the SSE listener to deliver the response with this ID
+            response = await future
+        finally:
+            self._pending.pop(msg_id, None)
         
-        # Wait for response with matching ID
-        while True:
-            response = await self.response_queue.get()
-            if response.get("id") == msg_id:
-                self._log_response(response)
-                return response
+        self._log_response(response)
+        return response
     
     async def connect(self):
         """Establish connection to server"""
         print("🔌 Connecting to MCP server...")
         print(f"   Server URL: {self.server_url}\n")
         
+        # Open the HTTP client inside the running loop that will use it.
+        # The SSE stream holds one connection open; requests share the rest
+        self.http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=30.0
+            )
+        )
+        
         # Start SSE listener
         self.sse_task = asyncio.create_task(self._sse_listener())
-        await asyncio.sleep(0.5)  # Give SSE time to connect
+        try:
+            await asyncio.wait_for(self._sse_ready.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            raise Exception("Timed out opening SSE connection")
+        if self.sse_task.done():
+            raise Exception("Failed to open SSE connection")
         
         # Initialize protocol
         response = await self._send_request("initialize", {
@@ -105,10 +207,10 @@ class MCPWeatherClient:
             }
         })
         
-        if "result" in response:
+        if response.result is not None:
             print("✅ Connection established")
-            print(f"   Protocol version: {response['result']['protocolVersion']}")
-            print(f"   Server: {response['result']['serverInfo']['name']}\n")
+            print(f"   Protocol version: {response.result['protocolVersion']}")
+            print(f"   Server: {response.result['serverInfo']['name']}\n")
         else:
             raise Exception("Failed to initialize connection")
     
@@ -118,8 +220,8 @@ class MCPWeatherClient:
         
         response = await self._send_request("tools/list")
         
-        if "result" in response:
-            tools = response["result"]["tools"]
+        if response.result is not None:
+            tools = response.result["tools"]
             print(f"✅ Found {len(tools)} tools:\n")
             
             for tool in tools:
@@ -141,13 +243,13 @@ class MCPWeatherClient:
             "arguments": arguments
         })
         
-        if "result" in response:
-            content = response["result"]["content"][0]
+        if response.result is not None:
+            content = response.result["content"][0]
             result_text = content["text"]
             print("✅ Tool execution successful\n")
             return result_text
         else:
-            error = response.get("error", {})
+            error = response.error or {}
             raise Exception(f"Tool call failed: {error.get('message', 'Unknown error')}")
     
     async def disconnect(self):
@@ -161,7 +263,9 @@ class MCPWeatherClient:
             except asyncio.CancelledError:
                 pass
         
-        await self.http_client.aclose()
+        if self.http_client:
+            await self.http_client.aclose()
+            self.http_client = None
         print("✅ Disconnected\n")
 
 
@@ -182,41 +286,26 @@ async def run_demo(verbose: bool = False):
         # Step 2: Discover tools
         await client.list_tools()
         
-        # Step 3: Get current weather
-        print("-" * 60)
-        print("DEMO 1: Get Current Weather")
-        print("-" * 60)
-        result = await client.call_tool(
-            "get_current_weather",
-            {"city": "New Delhi"}
+        # Steps 3-5: the queries are independent, so run them concurrently
+        demos = [
+            ("DEMO 1: Get Current Weather",
+             "get_current_weather", {"city": "New Delhi"}),
+            ("DEMO 2: Get Weather Forecast",
+             "get_forecast", {"city": "Gwalior", "days": 5}),
+            ("DEMO 3: Another Current Weather Query",
+             "get_current_weather", {"city": "Hyderabad"}),
+        ]
+        results = await asyncio.gather(
+            *(client.call_tool(name, arguments) for _, name, arguments in demos)
         )
-        print("📊 Result:")
-        print(result)
-        print()
-        
-        # Step 4: Get forecast
-        print("-" * 60)
-        print("DEMO 2: Get Weather Forecast")
-        print("-" * 60)
-        result = await client.call_tool(
-            "get_forecast",
-            {"city": "Gwalior", "days": 5}
-        )
-        print("📊 Result:")
-        print(result)
-        print()
-        
-        # Step 5: Another example
-        print("-" * 60)
-        print("DEMO 3: Another Current Weather Query")
-        print("-" * 60)
-        result = await client.call_tool(
-            "get_current_weather",
-            {"city": "Hyderabad"}
-        )
-        print("📊 Result:")
-        print(result)
-        print()
+        
+        for (title, _, _), result in zip(demos, results):
+            print("-" * 60)
+            print(title)
+            print("-" * 60)
+            print("📊 Result:")
+            print(result)
+            print()
         
     except Exception as e:
         print(f"\n❌ Error: {e}\n")
@@ -237,7 +326,10 @@ def main():
     )
     args = parser.parse_args()
     
-    asyncio.run(run_demo(verbose=args.verbose))
+    if uvloop:
+        uvloop.run(run_demo(verbose=args.verbose))
+    else:
+        asyncio.run(run_demo(verbose=args.verbose))
 
 
 if __name__ == "__main__":
@@ -5,39 +5,41 @@ import json
 
 app = Server("ap-government-mcp-server")
 
+TOOLS = [
+    Tool(
+        name="get_schemes",
+        description="if you need help with government schemes related inputs \
+        for Indian farm conditions, this tool will help you with the proper inputs",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "category": {
+                    "type": "string",
+                    "description": "Category of scheme (subsidy, insurance, training, etc.)"
+                }
+            },
+            "required": ["category"]
+        }
+    ),
+    Tool(
+        name="get_farmer_programs",
+        description="Get information about farmer welfare programs",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "district": {
+                    "type": "string",
+                    "description": "District name in AP"
+                }
+            },
+            "required": ["district"]
+        }
+    )
+]
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
-    return [
-        Tool(
-            name="get_schemes",
-            description="if you need help with government schemes related inputs \
-            for Indian farm conditions, this tool will help you with the proper inputs",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "category": {
-                        "type": "string",
-                        "description": "Category of scheme (subsidy, insurance, training, etc.)"
-                    }
-                },
-                "required": ["category"]
-            }
-        ),
-        Tool(
-            name="get_farmer_programs",
-            description="Get information about farmer welfare programs",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "district": {
-                        "type": "string",
-                        "description": "District name in AP"
-                    }
-                },
-                "required": ["district"]
-            }
-        )
-    ]
+    return TOOLS
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
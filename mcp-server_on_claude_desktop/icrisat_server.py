@@ -5,38 +5,40 @@ import json
 
 app = Server("icrisat-mcp-server")
 
+TOOLS = [
+    Tool(
+        name="get_pest_info",
+        description="Get information about citrus pests and diseases",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "pest_name": {
+                    "type": "string",
+                    "description": "Name of the pest or disease"
+                }
+            },
+            "required": ["pest_name"]
+        }
+    ),
+    Tool(
+        name="get_soil_health",
+        description="Get soil health indicators for citrus cultivation",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "Location/region for soil data"
+                }
+            },
+            "required": ["location"]
+        }
+    )
+]
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
-    return [
-        Tool(
-            name="get_pest_info",
-            description="Get information about citrus pests and diseases",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "pest_name": {
-                        "type": "string",
-                        "description": "Name of the pest or disease"
-                    }
-                },
-                "required": ["pest_name"]
-            }
-        ),
-        Tool(
-            name="get_soil_health",
-            description="Get soil health indicators for citrus cultivation",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "Location/region for soil data"
-                    }
-                },
-                "required": ["location"]
-            }
-        )
-    ]
+    return TOOLS
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
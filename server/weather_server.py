@@ -3,9 +3,11 @@
 MCP Weather Server - Exposes weather tools via HTTP/SSE transport
 """
 import asyncio
-import json
+import contextlib
+import time
 from typing import Any
-import httpx
+import aiohttp
+import msgspec
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
@@ -19,166 +21,300 @@ import uvicorn
 # Initialize MCP server
 mcp_server = Server("weather-server")
 
-# HTTP client for weather API
-http_client = httpx.AsyncClient(timeout=10.0)
 
+# wttr.in response schema - only the fields the tools read are declared,
+# everything else in the payload is skipped by the decoder
+class WeatherDesc(msgspec.Struct):
+    value: str
 
-async def fetch_weather_data(city: str) -> dict:
+
+class CurrentCondition(msgspec.Struct):
+    temp_C: str
+    temp_F: str
+    weatherDesc: list[WeatherDesc]
+    humidity: str
+    windspeedKmph: str
+    winddir16Point: str
+
+
+class HourlyForecast(msgspec.Struct):
+    weatherDesc: list[WeatherDesc]
+
+
+class DailyForecast(msgspec.Struct):
+    date: str
+    maxtempC: str
+    mintempC: str
+    hourly: list[HourlyForecast]
+
+
+class WeatherData(msgspec.Struct):
+    current_condition: list[CurrentCondition]
+    weather: list[DailyForecast]
+
+
+weather_decoder = msgspec.json.Decoder(WeatherData)
+
+# Weather data changes on a minute scale, so recent responses are reused
+WEATHER_CACHE_TTL = 60.0
+WEATHER_CACHE_SIZE = 1024
+weather_cache: dict[str, tuple[float, WeatherData]] = {}
+weather_inflight: dict[str, asyncio.Task] = {}
+
+
+async def fetch_weather_data(city: str) -> WeatherData:
+    """Fetch weather data for a city, served from cache while fresh"""
+    key = city.strip().lower()
+    cached = weather_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    # Concurrent callers for the same city share one upstream request
+    task = weather_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(request_weather_data(city))
+        weather_inflight[key] = task
+        
+        def store(done: asyncio.Task):
+            del weather_inflight[key]
+            if done.cancelled() or done.exception() is not None:
+                return
+            now = time.monotonic()
+            if len(weather_cache) >= WEATHER_CACHE_SIZE:
+                for stale in [k for k, (expires, _) in weather_cache.items() if expires <= now]:
+                    del weather_cache[stale]
+            weather_cache[key] = (now + WEATHER_CACHE_TTL, done.result())
+        
+        task.add_done_callback(store)
+    
+    # Shielded so one caller going away does not cancel the shared request
+    return await asyncio.shield(task)
+
+
+async def request_weather_data(city: str) -> WeatherData:
     """Fetch weather data from wttr.in API"""
     try:
         url = f"https://wttr.in/{city}?format=j1"
-        response = await http_client.get(url)
-        response.raise_for_status()
-        return response.json()
+        async with app.state.http.get(url) as response:
+            response.raise_for_status()
+            # Decode the body bytes directly; response.json() would first
+            # decode them to str
+            return weather_decoder.decode(await response.read())
     except Exception as e:
         raise Exception(f"Failed to fetch weather data: {str(e)}")
 
 
+TOOLS = [
+    Tool(
+        name="get_current_weather",
+        description="Get current weather conditions for a city",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "city": {
+                    "type": "string",
+                    "description": "City name (e.g., London, Tokyo, New York)"
+                }
+            },
+            "required": ["city"]
+        }
+    ),
+    Tool(
+        name="get_forecast",
+        description="Get weather forecast for a city",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "city": {
+                    "type": "string",
+                    "description": "City name (e.g., London, Tokyo, New York)"
+                },
+                "days": {
+                    "type": "integer",
+                    "description": "Number of days for forecast (1-3)",
+                    "minimum": 1,
+                    "maximum": 3
+                }
+            },
+            "required": ["city", "days"]
+        }
+    )
+]
+
+# tools/list result payload, built once since the tool set is static
+TOOLS_LIST_RESULT = {
+    "tools": [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.inputSchema
+        }
+        for tool in TOOLS
+    ]
+}
+
+
 @mcp_server.list_tools()
 async def list_tools() -> list[Tool]:
     """List available weather tools"""
-    return [
-        Tool(
-            name="get_current_weather",
-            description="Get current weather conditions for a city",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "City name (e.g., London, Tokyo, New York)"
-                    }
-                },
-                "required": ["city"]
-            }
-        ),
-        Tool(
-            name="get_forecast",
-            description="Get weather forecast for a city",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "City name (e.g., London, Tokyo, New York)"
-                    },
-                    "days": {
-                        "type": "integer",
-                        "description": "Number of days for forecast (1-3)",
-                        "minimum": 1,
-                        "maximum": 3
-                    }
-                },
-                "required": ["city", "days"]
-            }
+    return TOOLS
+
+
+def format_current_weather(data: WeatherData, city: str) -> str:
+    """Format current conditions for display"""
+    current = data.current_condition[0]
+    return f"""Current Weather in {city}:
+Temperature: {current.temp_C}°C ({current.temp_F}°F)
+Condition: {current.weatherDesc[0].value}
+Humidity: {current.humidity}%
+Wind: {current.windspeedKmph} km/h {current.winddir16Point}"""
+
+
+def format_forecast(data: WeatherData, city: str, days: int) -> str:
+    """Format a multi-day forecast for display"""
+    forecast_lines = [f"{days}-Day Weather Forecast for {city}:\n"]
+    
+    for day in data.weather[:days]:
+        condition = day.hourly[0].weatherDesc[0].value
+        forecast_lines.append(
+            f"📅 {day.date}: {day.mintempC}°C - {day.maxtempC}°C, {condition}"
         )
-    ]
+    
+    return "\n".join(forecast_lines)
 
 
-@mcp_server.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool execution"""
+# Formatted tool output, reused for as long as the cached data it was built from
+rendered_cache: dict[tuple, tuple[WeatherData, str]] = {}
+
+
+def render_cached(render, data: WeatherData, *args) -> str:
+    """Format weather data, reusing the previous text if the data is unchanged"""
+    key = (render, *args)
+    cached = rendered_cache.get(key)
+    if cached and cached[0] is data:
+        return cached[1]
+    
+    if len(rendered_cache) >= WEATHER_CACHE_SIZE:
+        rendered_cache.clear()
+    text = render(data, *args)
+    rendered_cache[key] = (data, text)
+    return text
+
+
+async def run_tool(name: str, arguments: Any) -> str:
+    """Execute a tool and return its text output"""
     
     if name == "get_current_weather":
         city = arguments.get("city")
         if not city:
-            return [TextContent(type="text", text="Error: City parameter is required")]
+            return "Error: City parameter is required"
         
         try:
             data = await fetch_weather_data(city)
-            current = data["current_condition"][0]
-            
-            result = {
-                "city": city,
-                "temperature_c": current["temp_C"],
-                "temperature_f": current["temp_F"],
-                "condition": current["weatherDesc"][0]["value"],
-                "humidity": current["humidity"],
-                "wind_speed_kmph": current["windspeedKmph"],
-                "wind_direction": current["winddir16Point"]
-            }
-            
-            formatted = f"""Current Weather in {city}:
-Temperature: {result['temperature_c']}°C ({result['temperature_f']}°F)
-Condition: {result['condition']}
-Humidity: {result['humidity']}%
-Wind: {result['wind_speed_kmph']} km/h {result['wind_direction']}"""
-            
-            return [TextContent(type="text", text=formatted)]
+            return render_cached(format_current_weather, data, city)
             
         except Exception as e:
-            return [TextContent(type="text", text=f"Error: {str(e)}")]
+            return f"Error: {str(e)}"
     
     elif name == "get_forecast":
         city = arguments.get("city")
         days = arguments.get("days", 3)
         
         if not city:
-            return [TextContent(type="text", text="Error: City parameter is required")]
+            return "Error: City parameter is required"
         
         try:
             data = await fetch_weather_data(city)
-            weather_forecast = data["weather"][:days]
-            
-            forecast_lines = [f"{days}-Day Weather Forecast for {city}:\n"]
-            
-            for day in weather_forecast:
-                date = day["date"]
-                max_temp = day["maxtempC"]
-                min_temp = day["mintempC"]
-                condition = day["hourly"][0]["weatherDesc"][0]["value"]
-                
-                forecast_lines.append(
-                    f"📅 {date}: {min_temp}°C - {max_temp}°C, {condition}"
-                )
-            
-            return [TextContent(type="text", text="\n".join(forecast_lines))]
+            return render_cached(format_forecast, data, city, days)
             
         except Exception as e:
-            return [TextContent(type="text", text=f"Error: {str(e)}")]
+            return f"Error: {str(e)}"
     
     else:
-        return [TextContent(type="text", text=f"Error: Unknown tool '{name}'")]
+        return f"Error: Unknown tool '{name}'"
+
+
+@mcp_server.call_tool()
+async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Handle tool execution"""
+    return [TextContent(type="text", text=await run_tool(name, arguments))]
 
 
 # SSE connection management
-sse_connections = []
+sse_connections: set[asyncio.Queue] = set()
+
+# Messages buffered per subscriber before it is considered too slow and dropped
+SSE_QUEUE_SIZE = 256
 
 
 async def handle_sse(request: Request):
     """Handle SSE connection from client"""
+    # Subscribe before the response headers go out, so a client that starts
+    # sending requests as soon as the stream opens cannot miss a reply
+    queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    sse_connections.add(queue)
+    
     async def event_generator():
-        queue = asyncio.Queue()
-        sse_connections.append(queue)
-        
         try:
             while True:
-                message = await queue.get()
-                if message is None:
+                payload = await queue.get()
+                if payload is None:
                     break
-                yield {"data": json.dumps(message)}
+                yield {"data": payload}
         finally:
-            sse_connections.remove(queue)
+            sse_connections.discard(queue)
     
     return EventSourceResponse(event_generator())
 
 
+def broadcast(payload: str):
+    """Queue an encoded message for every SSE subscriber without blocking"""
+    for queue in list(sse_connections):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Drop subscribers that have stopped keeping up, evicting their
+            # oldest message to make room for the sentinel that ends the stream
+            sse_connections.discard(queue)
+            queue.get_nowait()
+            queue.put_nowait(None)
+
+
+# JSON-RPC message schema
+class RPCRequest(msgspec.Struct):
+    method: str
+    jsonrpc: str = "2.0"
+    params: dict = {}
+    id: int | str | None = None
+
+
+class RPCResponse(msgspec.Struct, kw_only=True):
+    jsonrpc: str = "2.0"
+    id: int | str | None
+    # Exactly one of these is set; the other is left out of the encoded message
+    result: Any = msgspec.UNSET
+    error: Any = msgspec.UNSET
+
+
+rpc_decoder = msgspec.json.Decoder(RPCRequest)
+rpc_encoder = msgspec.json.Encoder()
+
+
 async def handle_message(request: Request):
     """Handle incoming JSON-RPC messages from client"""
     try:
-        body = await request.json()
+        message = rpc_decoder.decode(await request.body())
         
         # Process the message through MCP server
         # This is a simplified handling - in production you'd use mcp.server's full transport
-        method = body.get("method")
-        params = body.get("params", {})
-        msg_id = body.get("id")
+        method = message.method
+        params = message.params
+        msg_id = message.id
         
         if method == "initialize":
-            response = {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "result": {
+            response = RPCResponse(
+                id=msg_id,
+                result={
                     "protocolVersion": "2024-11-05",
                     "capabilities": {
                         "tools": {}
@@ -188,78 +324,69 @@ async def handle_message(request: Request):
                         "version": "1.0.0"
                     }
                 }
-            }
+            )
         elif method == "tools/list":
-            tools = await list_tools()
-            response = {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "result": {
-                    "tools": [
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        }
-                        for tool in tools
-                    ]
-                }
-            }
+            response = RPCResponse(id=msg_id, result=TOOLS_LIST_RESULT)
         elif method == "tools/call":
             tool_name = params.get("name")
             arguments = params.get("arguments", {})
-            result = await call_tool(tool_name, arguments)
-            response = {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "result": {
-                    "content": [
-                        {"type": content.type, "text": content.text}
-                        for content in result
-                    ]
+            text = await run_tool(tool_name, arguments)
+            response = RPCResponse(
+                id=msg_id,
+                result={
+                    "content": [{"type": "text", "text": text}]
                 }
-            }
+            )
         else:
-            response = {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "error": {
+            response = RPCResponse(
+                id=msg_id,
+                error={
                     "code": -32601,
                     "message": f"Method not found: {method}"
                 }
-            }
+            )
         
-        # Send response via SSE to all connected clients
-        for queue in sse_connections:
-            await queue.put(response)
+        # Send response via SSE to all connected clients, encoded once
+        broadcast(rpc_encoder.encode(response).decode())
         
         return Response(
-            content=json.dumps({"status": "ok"}),
+            content=rpc_encoder.encode({"status": "ok"}),
             media_type="application/json"
         )
         
     except Exception as e:
         return Response(
-            content=json.dumps({"error": str(e)}),
+            content=rpc_encoder.encode({"error": str(e)}),
             status_code=500,
             media_type="application/json"
         )
 
 
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    """Open the weather API session for the lifetime of the app"""
+    # Keep wttr.in connections alive between tool calls so the TLS
+    # handshake is paid once rather than per request
+    app.state.http = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30.0)
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.close()
+
+
 # Starlette app setup
 app = Starlette(
     routes=[
         Route("/sse", endpoint=handle_sse),
         Route("/message", endpoint=handle_message, methods=["POST"]),
-    ]
+    ],
+    lifespan=lifespan
 )
 
 
-async def cleanup():
-    """Cleanup resources on shutdown"""
-    await http_client.aclose()
-
-
 if __name__ == "__main__":
     print("🌤️  MCP Weather Server")
     print("=" * 50)
@@ -269,7 +396,5 @@ if __name__ == "__main__":
     print("=" * 50)
     print("\nWaiting for client connections...\n")
     
-    try:
-        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
-    finally:
-        asyncio.run(cleanup())
+    # With uvicorn[standard] installed this runs on uvloop and httptools
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")